@@ -5,58 +5,103 @@ Toda la lógica de IA ahora se maneja en:
  - ai_service.py
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Request, Response, request, jsonify
+from flask.json.provider import JSONProvider
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
 
 import os
+import shutil
 import tempfile
-import json
 import logging
+import contextlib
+import functools
+import threading
+import hashlib
+import diskcache
+import orjson
 
 # Procesadores
-from document_processor import DocumentProcessor
-from pdf_converter import PDFConverter
+from document_processor import DocumentProcessor, pool_extraccion, EXTENSIONES_SIMPLES
+from pdf_converter import PDFConverter, FORMATOS_IMAGEN
 import legacy_reader
 
 # IA (lógica migrada desde la app Android)
 from ai_service import generar_examen
 
-# Google
-from google.oauth2 import service_account
-
 # ----------------------------------------------------
 # CONFIGURACIÓN GENERAL
 # ----------------------------------------------------
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
+class OrjsonProvider(JSONProvider):
+    """JSON de Flask (request.json / jsonify) serializado con orjson."""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj), mimetype="application/json")
+
+
+class UploadRequest(Request):
+    """
+    Mantiene en memoria las subidas de hasta SPOOL_MAX_SIZE bytes. Las más
+    grandes van directas a un temporal con nombre y extensión, que los
+    lectores abren por ruta sin volver a copiarlo (se borra al cerrar la petición).
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if total_content_length and total_content_length > SPOOL_MAX_SIZE:
+            extension = extension_subida(filename)
+            return tempfile.NamedTemporaryFile(
+                mode="wb+", suffix=f".{extension}" if extension else "",
+                dir=dir_temporal(total_content_length)
+            )
+        return tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE, mode="rb+")
+
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
+app.request_class = UploadRequest
 CORS(app)
 
 app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024
 
+# Tamaño del buffer al volcar la subida a disco (1 MiB)
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Subidas hasta este tamaño se quedan en RAM (por encima, Python las pasa a disco)
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+# tmpfs para los temporales de subida: LibreOffice/Tesseract releen desde RAM
+TMPFS_DIR = "/dev/shm"
+
+# Longitud máxima de "texto" aceptada por /ai/generate
+MAX_TEXTO_CHARS = int(os.environ.get("MAX_TEXTO_CHARS", 5_000_000))
+
 processor = DocumentProcessor()
-pdf_converter = PDFConverter()
 
-SHARED_DRIVE_ID = "0APWpYgysES7jUk9PVA"
+# Conversiones LibreOffice simultáneas por proceso (cada una es un soffice
+# que consume CPU y cientos de MB); el resto espera turno
+CONVERT_GATE = threading.BoundedSemaphore(max(1, (os.cpu_count() or 2) // 2))
 
+# Caché de texto extraído por contenido del archivo (compartida entre procesos)
+doc_cache = diskcache.Cache(os.environ.get("DOC_CACHE_DIR", "/tmp/doctext"))
 
-# ----------------------------------------------------
-# DETECTAR SI EL PDF TIENE TEXTO REAL
-# ----------------------------------------------------
-from PyPDF2 import PdfReader
 
-def pdf_tiene_texto(file_path):
-    try:
-        reader = PdfReader(file_path)
-        for page in reader.pages:
-            t = page.extract_text()
-            if t and t.strip():
-                return True
-        return False
-    except:
-        return False
+@functools.lru_cache(maxsize=None)
+def get_pdf_converter():
+    """PDFConverter se crea en el primer uso: detectar LibreOffice/unoconv lanza subprocesos."""
+    return PDFConverter()
+
+SHARED_DRIVE_ID = "0APWpYgysES7jUk9PVA"
 
 
 # ----------------------------------------------------
@@ -67,8 +112,10 @@ GOOGLE_JSON = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS_JSON")
 
 if GOOGLE_JSON:
     try:
+        from google.oauth2 import service_account
+
         google_credentials = service_account.Credentials.from_service_account_info(
-            json.loads(GOOGLE_JSON),
+            orjson.loads(GOOGLE_JSON),
             scopes=[
                 "https://www.googleapis.com/auth/drive",
                 "https://www.googleapis.com/auth/documents",
@@ -89,15 +136,19 @@ else:
 def generar_examen_ai():
     data = request.json
 
-    texto = data.get("texto", "").strip()
+    texto = data.get("texto", "")
     modelo = data.get("modelo", "gemini-2.0-flash-lite")
+    force_refresh = request.args.get("force_refresh", "").lower() in ("1", "true")
 
-    if not texto:
-        return jsonify({"error": "El texto está vacío"}), 400
+    if len(texto) > MAX_TEXTO_CHARS:
+        return jsonify({"error": "El texto es demasiado grande"}), 413
 
-    # 1. Limpiar texto (igual que TextFilter en la app)
+    # 1. Limpiar texto (igual que TextFilter en la app; ya incluye el strip)
     texto_limpio = processor.limpiar_texto(texto)
 
+    if not texto_limpio:
+        return jsonify({"error": "El texto está vacío"}), 400
+
     # 2. Dividir en bloques (igual que Android)
     bloques = processor.dividir_en_bloques(texto_limpio)
     total_bloques = len(bloques)
@@ -110,15 +161,181 @@ def generar_examen_ai():
         texto=texto_limpio,
         bloques=bloques,
         preguntas_por_bloque=preguntas_por_bloque,
-        modelo=modelo
+        modelo=modelo,
+        force_refresh=force_refresh
     )
 
-    return jsonify({
-        "success": True,
-        "total_bloques": total_bloques,
-        "preguntas_generadas": len(preguntas),
-        "preguntas": preguntas
-    })
+    # 5. Respuesta en streaming: una pregunta serializada cada vez
+    def generar_json():
+        yield b'{"success":true,"total_bloques":%d,"preguntas_generadas":%d,"preguntas":[' % (
+            total_bloques, len(preguntas)
+        )
+        for i, pregunta in enumerate(preguntas):
+            if i:
+                yield b","
+            yield orjson.dumps(pregunta)
+        yield b"]}"
+
+    return Response(generar_json(), mimetype="application/json")
+
+
+# ----------------------------------------------------
+# EXTRACCIÓN DE TEXTO (cadena de lectores)
+# ----------------------------------------------------
+def extension_subida(nombre):
+    """
+    Extensión del nombre original, no del de secure_filename: este descarta
+    los caracteres no ASCII ("тест.pdf" → "pdf") y con ellos el punto.
+    Solo se aceptan letras y dígitos ASCII (va al sufijo del temporal y a la
+    clave de caché).
+    """
+    extension = os.path.splitext(nombre or "")[1].lstrip(".").lower()
+    return extension if extension.isascii() and extension.isalnum() else ""
+
+
+def hash_subida(stream):
+    """Huella blake2b del archivo subido; deja el stream al inicio."""
+    h = hashlib.blake2b(digest_size=16)
+    while True:
+        chunk = stream.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        h.update(chunk)
+    stream.seek(0)
+    return h.hexdigest()
+
+
+def tamano_subida(stream):
+    tamano = stream.seek(0, os.SEEK_END)
+    stream.seek(0)
+    return tamano
+
+
+def dir_temporal(tamano):
+    """/dev/shm (RAM) si cabe la subida con margen; si no, el /tmp del sistema."""
+    try:
+        if shutil.disk_usage(TMPFS_DIR).free > 2 * tamano:
+            return TMPFS_DIR
+    except OSError:
+        pass
+    return None
+
+
+@contextlib.contextmanager
+def subida_guardada(stream, extension):
+    """
+    Entrega (path, digest) de la subida en disco. Si ya llegó a un temporal con
+    nombre (subidas grandes), se usa tal cual; si no, se vuelca a uno nuevo,
+    calculando la huella en la misma pasada, y se borra al salir del bloque.
+    """
+    ruta = getattr(stream, "name", None)
+    if isinstance(ruta, str) and ruta.endswith(f".{extension}"):
+        yield ruta, hash_subida(stream)
+        return
+
+    h = hashlib.blake2b(digest_size=16)
+    fd, temp_path = tempfile.mkstemp(
+        suffix=f".{extension}", dir=dir_temporal(tamano_subida(stream))
+    )
+    try:
+        with os.fdopen(fd, "wb", buffering=UPLOAD_CHUNK_SIZE) as tmp:
+            while True:
+                chunk = stream.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                h.update(chunk)
+                tmp.write(chunk)
+
+        yield temp_path, h.hexdigest()
+    finally:
+        borrar_temporal(temp_path)
+
+
+def borrar_temporal(path):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+def extraer_pdf(stream):
+    # PDF: se lee directamente desde la subida, sin escribirla a disco
+    # (en el pool de procesos, fuera del GIL del worker). Las subidas grandes
+    # ya están en un temporal: se pasa la ruta y las páginas se reparten
+    ruta = getattr(stream, "name", None)
+    fuente = ruta if isinstance(ruta, str) else stream.read()
+    pdf_text = processor.leer_pdf_paralelo(fuente)
+    if pdf_text["texto"].strip():
+        return pdf_text
+
+    # Sin capa de texto (escaneado): pasa a disco para el OCR
+    stream.seek(0)
+    with subida_guardada(stream, "pdf") as (temp_path, _):
+        return extraer_texto(temp_path, "pdf")
+
+
+def leer_local(temp_path, extension):
+    # docx/xlsx/xls/txt/csv: se leen en el pool de procesos, sin LibreOffice
+    if extension not in EXTENSIONES_SIMPLES:
+        return SIN_TEXTO
+    return pool_extraccion().ejecutar(processor.leer_simple, temp_path, extension)
+
+
+def leer_convertido(temp_path, extension):
+    # Los PDF ya se intentaron en memoria, y una imagen convertida a PDF
+    # no trae texto: ambos van directos al OCR
+    if extension == "pdf" or extension in FORMATOS_IMAGEN:
+        return SIN_TEXTO
+
+    with CONVERT_GATE:
+        pdf_res = get_pdf_converter().convertir_a_pdf(temp_path, extension)
+    if not pdf_res:
+        return SIN_TEXTO
+    try:
+        return processor.leer_pdf_paralelo(pdf_res)
+    finally:
+        if pdf_res != temp_path:
+            borrar_temporal(pdf_res)
+
+
+def leer_ocr(temp_path, extension):
+    return {"texto": legacy_reader.ocr_fallback(temp_path), "method": "ocr"}
+
+
+# Cadena de lectores, de más rápido a más lento: gana la primera etapa con
+# texto. Las que no aplican a la extensión vuelven enseguida sin texto, así
+# que LibreOffice solo se lanza si el lector local no sirvió
+ETAPAS = (leer_local, leer_convertido, processor.leer_legacy, leer_ocr)
+
+SIN_TEXTO = {
+    "texto": "",
+    "method": "none",
+    "warnings": ["No se pudo extraer texto del documento"]
+}
+
+
+def extraer_texto(temp_path, extension):
+    for etapa in ETAPAS:
+        resultado = etapa(temp_path, extension)
+        if resultado["texto"].strip():
+            return resultado
+
+    return SIN_TEXTO
+
+
+def extraer_con_cache(clave, extraer):
+    # Mismo contenido y extensión ya procesados → respuesta desde caché
+    # (la extensión decide el lector: los mismos bytes como .txt o .csv
+    # devuelven distinto "method")
+    cached = doc_cache.get(clave)
+    if cached:
+        logger.info(f"Texto recuperado de caché: {clave}")
+        return cached
+
+    resultado = extraer()
+    if resultado["texto"].strip():
+        doc_cache.set(clave, resultado)
+    return resultado
 
 
 # ----------------------------------------------------
@@ -126,6 +343,10 @@ def generar_examen_ai():
 # ----------------------------------------------------
 @app.route('/procesar', methods=['POST'])
 def procesar_documento():
+    # Cuerpo declarado demasiado grande: se rechaza antes de leer nada
+    if request.content_length and request.content_length > app.config["MAX_CONTENT_LENGTH"]:
+        return jsonify({"status": "error", "message": "Archivo demasiado grande"}), 413
+
     try:
         if "file" not in request.files:
             return jsonify({"status": "error", "message": "No se envió archivo"}), 400
@@ -136,53 +357,31 @@ def procesar_documento():
         if filename == "":
             return jsonify({"status": "error", "message": "Archivo sin nombre"}), 400
 
-        extension = filename.rsplit(".", 1)[-1].lower()
-
-        with tempfile.NamedTemporaryFile(delete=False, suffix=f".{extension}") as tmp:
-            file.save(tmp.name)
-            temp_path = tmp.name
+        extension = extension_subida(file.filename)
 
         logger.info(f"Archivo recibido: {filename} ({extension})")
 
-        usar_google = True
-        if extension == "pdf" and not pdf_tiene_texto(temp_path):
-            usar_google = False
-
-        if usar_google:
-            pass  # (Tu lógica original, no la tocamos)
-
-        # PDF Converter
-        pdf_res = pdf_converter.convertir_a_pdf(temp_path, extension)
-        if pdf_res:
-            pdf_text = processor.leer_pdf(pdf_res)
-            if pdf_text["texto"].strip():
-                return jsonify({"status": "success", **pdf_text}), 200
-
-        # Simple reader
-        simple_res = processor.leer_simple(temp_path, extension)
-        if simple_res["texto"].strip():
-            return jsonify({"status": "success", **simple_res}), 200
-
-        # Legacy reader
-        legacy_res = processor.leer_legacy(temp_path, extension)
-        if legacy_res["texto"].strip():
-            return jsonify({"status": "success", **legacy_res}), 200
-
-        # OCR normal
-        ocr_text = legacy_reader.ocr_fallback(temp_path)
-        if ocr_text.strip():
+        # Archivo vacío: nada que leer, ni se escribe a disco ni se calcula el hash
+        if tamano_subida(file.stream) == 0:
             return jsonify({
                 "status": "success",
-                "texto": ocr_text,
-                "method": "ocr",
+                "texto": "",
+                "method": "none",
+                "warnings": ["El archivo está vacío"]
             }), 200
 
-        return jsonify({
-            "status": "success",
-            "texto": "",
-            "method": "none",
-            "warnings": ["No se pudo extraer texto del documento"]
-        }), 200
+        # PDF: solo se hashea (se lee desde memoria). Resto: se vuelca a disco
+        # y se hashea en la misma pasada, sin releer la subida
+        if extension == "pdf":
+            clave = f"{hash_subida(file.stream)}:{extension}"
+            resultado = extraer_con_cache(clave, lambda: extraer_pdf(file.stream))
+        else:
+            with subida_guardada(file.stream, extension) as (temp_path, digest):
+                resultado = extraer_con_cache(
+                    f"{digest}:{extension}", lambda: extraer_texto(temp_path, extension)
+                )
+
+        return jsonify({"status": "success", **resultado}), 200
 
     except Exception as e:
         logger.error(f"ERROR GENERAL: {e}")
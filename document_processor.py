@@ -14,16 +14,165 @@ Incluye mejoras del modo IA de la app Android:
  - Recorte por tipo (BASICO, MODERADO, COMPLETO)
 """
 
-from docx import Document
 from openpyxl import load_workbook
-from PyPDF2 import PdfReader
+import fitz  # PyMuPDF
 import os
 import re
 import xlrd
+import zipfile
+from xml.etree.ElementTree import iterparse
+from process_pool import PoolProcesos
+from texto_util import decodificar_texto
 
 # Legacy readers
 import legacy_reader
 
+# Patrones de limpieza precompilados (limpiar_texto se llama en cada petición)
+_RUIDO_OCR_RE = re.compile(r"(OCR|PAGINA_\d+|ERROR|FAILED|SCAN)", re.I)
+_ESPACIOS_RE = re.compile(r"\s+")
+# Caracteres que se borran en la misma pasada (NUL aparece en PDFs mal generados)
+_INVISIBLES = str.maketrans("", "", "\u200b\ufeff\x00")
+
+# Los avisos de MuPDF (fuentes o xref dañados) no van a stderr en cada página;
+# quedan en fitz.TOOLS.mupdf_warnings()
+fitz.TOOLS.mupdf_display_errors(False)
+
+# Lectores legacy por extensión
+_LECTORES_LEGACY = {
+    "ppt": legacy_reader.leer_ppt_antiguo,
+    "doc": legacy_reader.leer_doc_antiguo,
+    "xls": legacy_reader.leer_xls_antiguo,
+}
+
+# Procesos para parsear PDF/DOCX/XLSX: el parseo retiene el GIL y con hilos
+# las peticiones simultáneas se turnan en un solo núcleo
+EXTRACCION_WORKERS = int(os.environ.get("EXTRACCION_WORKERS", os.cpu_count() or 1))
+
+# A partir de cuántas páginas se reparte un PDF entre varios procesos
+PDF_PAGINAS_MIN_PARALELO = 8
+
+# Pool persistente: se crea en la primera extracción y se reutiliza
+_pool = PoolProcesos(EXTRACCION_WORKERS)
+
+
+def pool_extraccion():
+    return _pool
+
+
+def abrir_pdf(fuente):
+    if isinstance(fuente, str):
+        return fitz.open(fuente)
+    if isinstance(fuente, bytes):
+        return fitz.open(stream=fuente, filetype="pdf")
+    return fitz.open(stream=fuente.read(), filetype="pdf")
+
+
+def texto_paginas_pdf(fuente, inicio=0, fin=None):
+    """Texto de las páginas [inicio, fin) del PDF, hasta el final si fin es None (se ejecuta en pool_extraccion)."""
+    with abrir_pdf(fuente) as doc:
+        return _texto_paginas(doc, inicio, doc.page_count if fin is None else fin)
+
+
+def _texto_paginas(doc, inicio, fin):
+    return "".join(doc[i].get_text() for i in range(inicio, fin))
+
+
+# WordprocessingML: w:document > w:body > w:p > w:r > w:t
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_W_BODY = _W + "body"
+_W_P = _W + "p"
+_W_R = _W + "r"
+_W_T = _W + "t"
+_W_TEXTO = {_W_T: None, _W + "tab": "\t", _W + "br": "\n", _W + "cr": "\n"}
+# Antepasados de un w:t/w:tab/w:br/w:cr que cuenta (bajo w:document)
+_RUTA_RUN = [_W_BODY, _W_P, _W_R]
+
+
+# -----------------------------------------------------
+# Lectores simples (modernos), uno por formato
+# -----------------------------------------------------
+def _leer_docx(path):
+    """
+    Texto del DOCX leído en streaming desde el XML del zip, con el mismo
+    resultado que Document.paragraphs de python-docx: un párrafo por cada
+    w:p hijo directo de w:body, con el texto de sus w:r directos. Quedan fuera
+    las tablas, los cuadros de texto y los runs dentro de w:hyperlink, w:ins,
+    w:smartTag o w:fldSimple.
+    """
+    parrafos = []
+    actual = []
+    antepasados = []
+
+    with zipfile.ZipFile(path) as z, z.open(_parte_principal_docx(z)) as xml:
+        for evento, el in iterparse(xml, events=("start", "end")):
+            if evento == "start":
+                antepasados.append(el.tag)
+                continue
+
+            antepasados.pop()
+            if el.tag in _W_TEXTO and antepasados[1:] == _RUTA_RUN:
+                actual.append((el.text or "") if el.tag == _W_T else _W_TEXTO[el.tag])
+            elif len(antepasados) == 2 and antepasados[1] == _W_BODY:
+                # Fin de un hijo de w:body: se libera su subárbol
+                if el.tag == _W_P:
+                    parrafos.append("".join(actual))
+                actual = []
+                el.clear()
+
+    return "\n".join(parrafos)
+
+
+def _parte_principal_docx(z):
+    # Casi siempre word/document.xml, pero la ruta la fija _rels/.rels
+    with z.open("_rels/.rels") as rels:
+        for _, el in iterparse(rels):
+            if el.get("Type", "").endswith("/officeDocument"):
+                return el.get("Target").lstrip("/")
+    return "word/document.xml"
+
+
+def _leer_xlsx(path):
+    # read_only: las filas se leen en streaming, sin cargar el libro entero
+    libro = load_workbook(filename=path, read_only=True, data_only=True)
+    try:
+        lineas = []
+        for ws in libro.worksheets:
+            for row in ws.iter_rows(values_only=True):
+                lineas.append(" ".join([str(v) if v else "" for v in row]) + "\n")
+    finally:
+        libro.close()
+    return "".join(lineas)
+
+
+def _leer_xls(path):
+    lineas = []
+    libro = xlrd.open_workbook(path)
+    for hoja in libro.sheets():
+        for row_idx in range(hoja.nrows):
+            fila = hoja.row_values(row_idx)
+            lineas.append(" ".join([str(v) for v in fila]) + "\n")
+    return "".join(lineas)
+
+
+def _leer_texto_plano(path):
+    # Sin búfer: FileIO.readall dimensiona la lectura con fstat y lee de una vez
+    with open(path, "rb", buffering=0) as f:
+        datos = f.read()
+    return decodificar_texto(datos)
+
+
+# Extensión → lector; el "method" del resultado es la propia extensión
+_LECTORES_SIMPLES = {
+    "docx": _leer_docx,
+    "xlsx": _leer_xlsx,
+    "xls": _leer_xls,
+    "txt": _leer_texto_plano,
+    "csv": _leer_texto_plano,
+}
+
+# Extensiones que leer_simple sabe leer sin conversión
+EXTENSIONES_SIMPLES = frozenset(_LECTORES_SIMPLES)
+
 
 class DocumentProcessor:
 
@@ -31,45 +180,12 @@ class DocumentProcessor:
     # 🔹 1. LECTOR SIMPLE (modernos)
     # ======================================================
     def leer_simple(self, path, extension):
-        try:
-            # DOCX
-            if extension == "docx":
-                doc = Document(path)
-                texto = "\n".join([p.text for p in doc.paragraphs])
-                return {"texto": texto, "method": "docx", "warnings": []}
-
-            # XLSX
-            elif extension == "xlsx":
-                libro = load_workbook(filename=path, data_only=True)
-                texto = ""
-                for hoja in libro.sheetnames:
-                    ws = libro[hoja]
-                    for row in ws.iter_rows():
-                        texto += " ".join([str(c.value) if c.value else "" for c in row]) + "\n"
-                return {"texto": texto, "method": "xlsx", "warnings": []}
-
-            # XLS moderno
-            elif extension == "xls":
-                texto = ""
-                libro = xlrd.open_workbook(path)
-                for hoja in libro.sheets():
-                    for row_idx in range(hoja.nrows):
-                        fila = hoja.row_values(row_idx)
-                        texto += " ".join([str(v) for v in fila]) + "\n"
-                return {"texto": texto, "method": "xls", "warnings": []}
-
-            # TXT
-            elif extension == "txt":
-                with open(path, "r", encoding="utf-8", errors="ignore") as f:
-                    return {"texto": f.read(), "method": "txt", "warnings": []}
-
-            # CSV
-            elif extension == "csv":
-                with open(path, "r", encoding="utf-8", errors="ignore") as f:
-                    return {"texto": f.read(), "method": "csv", "warnings": []}
-
+        lector = _LECTORES_SIMPLES.get(extension)
+        if lector is None:
             return {"texto": "", "method": "simple_unknown", "warnings": []}
 
+        try:
+            return {"texto": lector(path), "method": extension, "warnings": []}
         except Exception as e:
             return {"texto": "", "method": "simple_error", "warnings": [str(e)]}
 
@@ -77,11 +193,40 @@ class DocumentProcessor:
     # 🔹 2. LECTOR PDF
     # ======================================================
     def leer_pdf(self, path):
+        """path puede ser una ruta, los bytes del PDF o un archivo abierto en modo binario."""
+        try:
+            # PyMuPDF extrae el texto en C, mucho más rápido que PyPDF2
+            with abrir_pdf(path) as doc:
+                texto = _texto_paginas(doc, 0, doc.page_count)
+
+            return {"texto": texto, "method": "pdf", "warnings": []}
+        except Exception as e:
+            return {"texto": "", "method": "pdf_error", "warnings": [str(e)]}
+
+    def leer_pdf_paralelo(self, fuente):
+        """
+        Igual que leer_pdf, pero en los procesos de pool_extraccion. fuente:
+        ruta (las páginas se reparten en tramos) o bytes (una sola tarea: cada
+        tramo copiaría el PDF entero al proceso).
+        """
         try:
-            reader = PdfReader(path)
-            texto = ""
-            for page in reader.pages:
-                texto += page.extract_text() or ""
+            if isinstance(fuente, bytes):
+                texto = pool_extraccion().ejecutar(texto_paginas_pdf, fuente)
+                return {"texto": texto, "method": "pdf", "warnings": []}
+
+            with abrir_pdf(fuente) as doc:
+                paginas = doc.page_count
+
+            # PDF corto: una sola tarea (repartir cuesta más que lo que ahorra)
+            if paginas < PDF_PAGINAS_MIN_PARALELO:
+                tramo = paginas or 1
+            else:
+                tramo = -(-paginas // EXTRACCION_WORKERS)
+            tramos = [
+                (fuente, inicio, min(inicio + tramo, paginas))
+                for inicio in range(0, paginas, tramo)
+            ]
+            texto = "".join(pool_extraccion().mapear(texto_paginas_pdf, tramos))
 
             return {"texto": texto, "method": "pdf", "warnings": []}
         except Exception as e:
@@ -91,24 +236,16 @@ class DocumentProcessor:
     # 🔹 3. LECTOR LEGACY
     # ======================================================
     def leer_legacy(self, path, extension):
-        try:
-            if extension == "ppt":
-                texto = legacy_reader.leer_ppt_antiguo(path)
-                return {"texto": texto, "method": "legacy_ppt", "warnings": []}
-
-            if extension == "doc":
-                texto = legacy_reader.leer_doc_antiguo(path)
-                return {"texto": texto, "method": "legacy_doc", "warnings": []}
-
-            if extension == "xls":
-                texto = legacy_reader.leer_xls_antiguo(path)
-                return {"texto": texto, "method": "legacy_xls", "warnings": []}
+        lector = _LECTORES_LEGACY.get(extension)
+        if lector is None:
+            return {"texto": "", "method": "legacy_none", "warnings": []}
 
+        try:
+            texto = lector(path)
+            return {"texto": texto, "method": f"legacy_{extension}", "warnings": []}
         except Exception as e:
             return {"texto": "", "method": "legacy_error", "warnings": [str(e)]}
 
-        return {"texto": "", "method": "legacy_none", "warnings": []}
-
     # ======================================================
     # 🔹 4. OCR UNIVERSAL
     # ======================================================
@@ -123,9 +260,9 @@ class DocumentProcessor:
     # 🔹 5. LIMPIEZA DE TEXTO (nuevo, igual a la app)
     # ======================================================
     def limpiar_texto(self, texto: str):
-        texto = texto.replace("\u200b", "").replace("\ufeff", "")
-        texto = re.sub(r"(OCR|PAGINA_\d+|ERROR|FAILED|SCAN)", "", texto, flags=re.I)
-        texto = re.sub(r"\s+", " ", texto)
+        texto = texto.translate(_INVISIBLES)
+        texto = _RUIDO_OCR_RE.sub("", texto)
+        texto = _ESPACIOS_RE.sub(" ", texto)
         return texto.strip()
 
     # ======================================================
@@ -135,17 +272,22 @@ class DocumentProcessor:
 
         lineas = texto.split("\n")
         bloques = []
-        actual = ""
+        # Acumular en lista y unir al cerrar cada bloque (evita "+=" cuadrático)
+        actual = []
+        largo = 0
 
         for linea in lineas:
-            if len(actual) + len(linea) > max_size:
-                bloques.append(actual.strip())
-                actual = linea
+            if largo + len(linea) > max_size:
+                bloques.append(" ".join(actual).strip())
+                actual = [linea]
+                largo = len(linea)
             else:
-                actual += " " + linea
+                actual.append(linea)
+                largo += len(linea) + 1
 
-        if actual.strip():
-            bloques.append(actual.strip())
+        resto = " ".join(actual).strip()
+        if resto:
+            bloques.append(resto)
 
         # Unir bloque final pequeño (<300 chars)
         if len(bloques) >= 2 and len(bloques[-1]) < 300:
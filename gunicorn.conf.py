@@ -0,0 +1,29 @@
+"""
+Configuración de gunicorn (se carga sola al lanzar `gunicorn app:app`
+desde el directorio del proyecto).
+
+El backend pasa casi todo el tiempo esperando a Gemini, LibreOffice o
+Tesseract, así que cada proceso atiende varias peticiones con hilos.
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8080')}"
+
+# Pocos procesos y muchos hilos: el OCR ya reparte páginas en su propio pool
+# de procesos, y más workers solo multiplicarían ese pool por núcleo
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 16))
+
+# Conversiones LibreOffice (hasta 60 s) + OCR de documentos largos pueden superar
+# con creces el límite por defecto (30 s)
+timeout = 300
+
+# Importar la app antes de hacer fork: modelos, credenciales y módulos
+# pesados se cargan una vez y los procesos los comparten (copy-on-write)
+preload_app = True
+
+# Reciclar cada worker tras ~500 peticiones (con jitter para no reiniciarlos
+# todos a la vez): PyMuPDF, Pillow y los pools de procesos acumulan memoria
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 500))
+max_requests_jitter = 50
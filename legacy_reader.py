@@ -5,7 +5,7 @@ Lector universal para:
 - PPT antiguos (.ppt)
 - DOC antiguos (.doc)
 - XLS antiguos (.xls)
-- OCR fallback
+- OCR fallback (páginas en paralelo)
 - OCR agresivo sin pdf2image, sin numpy, sin cv2
 -----------------------------------------------------
 """
@@ -13,9 +13,43 @@ Lector universal para:
 from pptx import Presentation
 from PIL import Image, ImageFilter, ImageOps
 import pytesseract
+from pdf2image import convert_from_path, pdfinfo_from_path
 import xlrd
 import tempfile
+import threading
 import os
+from process_pool import PoolProcesos
+
+# tesserocr (opcional): Tesseract dentro del proceso, sin lanzar el binario
+# ni recargar el modelo de idioma en cada página
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+# Procesos para el OCR por páginas (1 = sin paralelismo)
+OCR_WORKERS = int(os.environ.get("OCR_WORKERS", os.cpu_count() or 1))
+OCR_DPI = 200
+
+# Lado máximo de una imagen para OCR: ~300 DPI en un folio; más píxeles
+# no mejoran a Tesseract y sí multiplican el tiempo (fotos de móvil)
+OCR_MAX_LADO = 2500
+
+# Pool de procesos persistente: se crea en el primer OCR y se reutiliza
+_ocr_pool = PoolProcesos(OCR_WORKERS)
+
+# Instancia de tesserocr por hilo: no es thread-safe, y con una sola por
+# proceso (bajo lock) los hilos de gunicorn harían el OCR de uno en uno
+_tess_local = threading.local()
+
+
+def _reiniciar_tesseract():
+    # Un hijo recién forkeado no hereda las instancias del padre
+    global _tess_local
+    _tess_local = threading.local()
+
+
+os.register_at_fork(after_in_child=_reiniciar_tesseract)
 
 # -----------------------------------------------------
 # 1. LEER PPT ANTIGUOS
@@ -87,18 +121,79 @@ def leer_xls_antiguo(path):
 # 4. OCR NORMAL
 # -----------------------------------------------------
 def ocr_fallback(path):
+    """
+    OCR página a página. En un PDF cada página se rasteriza con pdf2image en
+    el mismo proceso que la reconoce, repartidas entre OCR_WORKERS procesos
+    (Tesseract usa un solo núcleo): el worker web nunca guarda los mapas de bits.
+    """
     try:
-        img = Image.new("RGB", (2000, 2000), "white")
-        tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".png")
-        img.save(tmp.name)
-        texto = pytesseract.image_to_string(Image.open(tmp.name))
-        os.unlink(tmp.name)
-        return texto.strip()
+        if not path.lower().endswith(".pdf"):
+            return ocr_pagina(preparar_imagen(Image.open(path))).strip()
+
+        paginas = [(path, n) for n in range(1, pdfinfo_from_path(path)["Pages"] + 1)]
+
+        if OCR_WORKERS > 1 and len(paginas) > 1:
+            textos = pool_ocr().mapear(ocr_pagina_pdf, paginas)
+        else:
+            textos = [ocr_pagina_pdf(*p) for p in paginas]
+
+        return "\n".join(textos).strip()
     except Exception as e:
         print(f"[legacy_reader] OCR fallback error: {e}")
         return ""
 
 
+def ocr_pagina_pdf(path, pagina):
+    # Una sola página en memoria a la vez (pagina empieza en 1)
+    try:
+        img = convert_from_path(
+            path, dpi=OCR_DPI, first_page=pagina, last_page=pagina, grayscale=True
+        )[0]
+    except Exception as e:
+        print(f"[legacy_reader] OCR página {pagina} error: {e}")
+        return ""
+    return ocr_pagina(preparar_imagen(img))
+
+
+def preparar_imagen(img):
+    # Tesseract solo usa la luminancia: escala de grises (1/3 de memoria y de
+    # datos enviados al pool) y recorte de resolución a OCR_MAX_LADO.
+    # Con transparencia se compone antes sobre blanco: convert("L") descarta
+    # el alfa y los píxeles transparentes (casi siempre RGB 0,0,0) saldrían negros
+    if "A" in img.getbands() or "transparency" in img.info:
+        rgba = img.convert("RGBA")
+        fondo = Image.new("RGBA", rgba.size, (255, 255, 255, 255))
+        img = Image.alpha_composite(fondo, rgba)
+    img = img.convert("L")
+    if max(img.size) > OCR_MAX_LADO:
+        img.thumbnail((OCR_MAX_LADO, OCR_MAX_LADO), Image.LANCZOS)
+    return img
+
+
+def pool_ocr():
+    return _ocr_pool
+
+
+def ocr_pagina(img):
+    # Los errores se quedan en el proceso hijo: algunas excepciones de
+    # pytesseract no se pueden reconstruir en el padre y romperían el pool
+    try:
+        if tesserocr is not None:
+            return ocr_tesserocr(img)
+        return pytesseract.image_to_string(img)
+    except Exception as e:
+        print(f"[legacy_reader] OCR página error: {e}")
+        return ""
+
+
+def ocr_tesserocr(img):
+    api = getattr(_tess_local, "api", None)
+    if api is None:
+        api = _tess_local.api = tesserocr.PyTessBaseAPI()
+    api.SetImage(img)
+    return api.GetUTF8Text()
+
+
 # -----------------------------------------------------
 # 5. OCR AGRESIVO — versión compatible SIN pdf2image
 # -----------------------------------------------------
@@ -8,18 +8,26 @@ import tempfile
 import logging
 from typing import Optional, Tuple
 import shutil
-import chardet
+import fitz  # PyMuPDF
+from texto_util import decodificar_texto
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Formatos de imagen: se convierten con Pillow (el PDF resultante no tiene texto)
+FORMATOS_IMAGEN = frozenset({'jpg', 'jpeg', 'png', 'gif', 'bmp', 'tiff', 'tif', 'heic', 'heif', 'webp'})
+
 class PDFConverter:
     """Convierte cualquier formato de documento a PDF usando LibreOffice"""
     
     def __init__(self):
         self.libreoffice_path = self._detectar_libreoffice()
         self.unoconv_path = self._detectar_unoconv()
+        # Backend de TXT/CSV → PDF: se decide una vez, no en cada conversión
+        self._texto_a_pdf = (
+            self._texto_a_pdf_reportlab if self._detectar_reportlab() else self._texto_a_pdf_fitz
+        )
     
     def _detectar_libreoffice(self) -> Optional[str]:
         """Detecta la ruta de LibreOffice en el sistema"""
@@ -100,8 +108,7 @@ class PDFConverter:
                 logger.warning(f"Error convirtiendo texto a PDF: {str(e)}. Intentando LibreOffice...")
         
         # Formatos de imagen: convertir a PDF usando Pillow
-        formatos_imagen = ['jpg', 'jpeg', 'png', 'gif', 'bmp', 'tiff', 'tif', 'heic', 'heif', 'webp']
-        if extension_lower in formatos_imagen:
+        if extension_lower in FORMATOS_IMAGEN:
             try:
                 return self._convertir_imagen_a_pdf(file_path, extension_lower)
             except Exception as e:
@@ -128,7 +135,7 @@ class PDFConverter:
             except Exception as e:
                 logger.warning(f"Conversión de texto a PDF falló: {str(e)}")
         
-        if extension_lower in formatos_imagen:
+        if extension_lower in FORMATOS_IMAGEN:
             try:
                 return self._convertir_imagen_a_pdf(file_path, extension_lower)
             except Exception as e:
@@ -265,104 +272,101 @@ class PDFConverter:
         # Todos los demás formatos necesitan conversión
         return True
     
+    def _detectar_reportlab(self) -> bool:
+        """Comprueba si reportlab está instalado"""
+        try:
+            import reportlab  # noqa: F401
+        except ImportError:
+            logger.warning("reportlab no está instalado. TXT/CSV se convertirán con PyMuPDF")
+            return False
+        return True
+    
     def _convertir_texto_a_pdf(self, file_path: str, extension: str) -> str:
         """
-        Convierte un archivo de texto (TXT o CSV) a PDF usando reportlab
+        Convierte un archivo de texto (TXT o CSV) a PDF con el backend elegido en __init__
         """
         try:
-            from reportlab.lib.pagesizes import letter, A4
-            from reportlab.pdfgen import canvas
-            from reportlab.lib.units import inch
-            
-            # Detectar codificación del archivo
-            with open(file_path, 'rb') as f:
-                raw_data = f.read()
-                detected = chardet.detect(raw_data)
-                encoding = detected.get('encoding', 'utf-8') or 'utf-8'
-            
-            # Leer el contenido del archivo
-            try:
-                with open(file_path, 'r', encoding=encoding, errors='ignore') as f:
-                    contenido = f.read()
-            except:
-                # Si falla, intentar UTF-8
-                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    contenido = f.read()
-            
-            # Crear archivo PDF temporal
-            pdf_path = tempfile.NamedTemporaryFile(delete=False, suffix='.pdf').name
-            
-            # Crear PDF con reportlab
-            c = canvas.Canvas(pdf_path, pagesize=A4)
-            width, height = A4
-            margin = inch
-            x = margin
-            y = height - margin
-            line_height = 12
-            max_width = width - 2 * margin
-            
-            # Dividir el contenido en líneas
-            lineas = contenido.split('\n')
-            
-            for linea in lineas:
-                # Si la línea es muy larga, dividirla
-                if len(linea) > 100:
-                    palabras = linea.split(' ')
-                    linea_actual = ''
-                    for palabra in palabras:
-                        if len(linea_actual + ' ' + palabra) < 100:
-                            linea_actual += ' ' + palabra if linea_actual else palabra
-                        else:
-                            if linea_actual:
-                                c.drawString(x, y, linea_actual[:100])
-                                y -= line_height
-                                if y < margin:
-                                    c.showPage()
-                                    y = height - margin
-                            linea_actual = palabra
-                    if linea_actual:
-                        linea = linea_actual
-                
-                # Dibujar la línea
-                c.drawString(x, y, linea[:100])
-                y -= line_height
-                
-                # Nueva página si es necesario
-                if y < margin:
-                    c.showPage()
-                    y = height - margin
-            
-            c.save()
-            logger.info(f"Texto convertido a PDF exitosamente: {extension} → PDF")
-            return pdf_path
-            
-        except ImportError:
-            logger.warning("reportlab no está instalado. Intentando con PyMuPDF...")
-            # Fallback: usar PyMuPDF para crear PDF simple
-            try:
-                import fitz  # PyMuPDF
-                doc = fitz.open()  # Crear documento PDF vacío
-                page = doc.new_page()
-                
-                # Leer contenido
-                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    contenido = f.read()
-                
-                # Insertar texto en la página
-                rect = fitz.Rect(50, 50, 550, 750)
-                page.insert_text(rect.tl, contenido[:5000], fontsize=11)  # Limitar a 5000 caracteres
-                
-                pdf_path = tempfile.NamedTemporaryFile(delete=False, suffix='.pdf').name
-                doc.save(pdf_path)
-                doc.close()
-                
-                logger.info(f"Texto convertido a PDF con PyMuPDF: {extension} → PDF")
-                return pdf_path
-            except Exception as e:
-                raise ValueError(f"No se pudo convertir texto a PDF: {str(e)}")
+            return self._texto_a_pdf(file_path, extension)
         except Exception as e:
             raise ValueError(f"Error convirtiendo texto a PDF: {str(e)}")
     
+    def _texto_a_pdf_reportlab(self, file_path: str, extension: str) -> str:
+        """Convierte texto a PDF usando reportlab"""
+        from reportlab.lib.pagesizes import letter, A4
+        from reportlab.pdfgen import canvas
+        from reportlab.lib.units import inch
+        
+        # Una sola lectura; la codificación se detecta sobre los primeros 64 KB
+        with open(file_path, 'rb') as f:
+            contenido = decodificar_texto(f.read())
+        
+        # Crear archivo PDF temporal
+        pdf_path = tempfile.NamedTemporaryFile(delete=False, suffix='.pdf').name
+        
+        # Crear PDF con reportlab
+        c = canvas.Canvas(pdf_path, pagesize=A4)
+        width, height = A4
+        margin = inch
+        x = margin
+        y = height - margin
+        line_height = 12
+        max_width = width - 2 * margin
+        
+        # Dividir el contenido en líneas
+        lineas = contenido.split('\n')
+        
+        for linea in lineas:
+            # Si la línea es muy larga, dividirla
+            if len(linea) > 100:
+                palabras = linea.split(' ')
+                linea_actual = ''
+                for palabra in palabras:
+                    if len(linea_actual + ' ' + palabra) < 100:
+                        linea_actual += ' ' + palabra if linea_actual else palabra
+                    else:
+                        if linea_actual:
+                            c.drawString(x, y, linea_actual[:100])
+                            y -= line_height
+                            if y < margin:
+                                c.showPage()
+                                y = height - margin
+                        linea_actual = palabra
+                if linea_actual:
+                    linea = linea_actual
+            
+            # Dibujar la línea
+            c.drawString(x, y, linea[:100])
+            y -= line_height
+            
+            # Nueva página si es necesario
+            if y < margin:
+                c.showPage()
+                y = height - margin
+        
+        c.save()
+        logger.info(f"Texto convertido a PDF exitosamente: {extension} → PDF")
+        return pdf_path
+    
+    def _texto_a_pdf_fitz(self, file_path: str, extension: str) -> str:
+        """Alternativa sin reportlab: PDF simple de una página con PyMuPDF"""
+        doc = fitz.open()  # Crear documento PDF vacío
+        page = doc.new_page()
+        
+        # Leer contenido
+        with open(file_path, 'rb') as f:
+            contenido = decodificar_texto(f.read())
+        
+        # Insertar texto en la página
+        rect = fitz.Rect(50, 50, 550, 750)
+        page.insert_text(rect.tl, contenido[:5000], fontsize=11)  # Limitar a 5000 caracteres
+        
+        pdf_path = tempfile.NamedTemporaryFile(delete=False, suffix='.pdf').name
+        doc.save(pdf_path)
+        doc.close()
+        
+        logger.info(f"Texto convertido a PDF con PyMuPDF: {extension} → PDF")
+        return pdf_path
+    
     def _convertir_imagen_a_pdf(self, file_path: str, extension: str) -> str:
         """
         Convierte una imagen a PDF usando Pillow
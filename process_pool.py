@@ -0,0 +1,105 @@
+"""
+process_pool.py
+-----------------------------------------------------
+Pools de procesos para el trabajo de CPU (parseo de documentos y OCR).
+
+- Los procesos nacen de un forkserver que ya importó los lectores: arrancan
+  en caliente y no heredan hilos ni locks del worker de gunicorn.
+- Los procesos se reciclan tras TAREAS_POR_PROCESO tareas para que la memoria
+  que acumulan PyMuPDF/Pillow/Tesseract no crezca sin límite. Python >= 3.11
+  lo hace por proceso (max_tasks_per_child); en 3.10 (runtime.txt, Dockerfile)
+  PoolProcesos sustituye el pool entero tras TAREAS_POR_PROCESO * max_workers.
+- Si un hijo muere (MuPDF que revienta con un PDF malformado, el OOM killer),
+  el pool queda roto: PoolProcesos lo descarta, crea otro y reintenta una vez.
+-----------------------------------------------------
+"""
+
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Tareas que atiende cada proceso antes de reemplazarlo
+TAREAS_POR_PROCESO = int(os.environ.get("POOL_TAREAS_POR_PROCESO", 50))
+
+# Módulos que el forkserver importa una sola vez (los hijos los heredan)
+PRECARGA = ["document_processor", "legacy_reader"]
+
+# Sin max_tasks_per_child (Python < 3.11) el reciclado lo hace PoolProcesos
+RECICLAR_POOL = sys.version_info < (3, 11)
+
+
+def nuevo_pool(max_workers):
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        ctx = multiprocessing.get_context("forkserver")
+        ctx.set_forkserver_preload(PRECARGA)
+    else:
+        ctx = multiprocessing.get_context("spawn")
+
+    # max_tasks_per_child existe desde Python 3.11 (ver RECICLAR_POOL)
+    opciones = {}
+    if not RECICLAR_POOL:
+        opciones["max_tasks_per_child"] = TAREAS_POR_PROCESO
+
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=ctx, **opciones)
+
+
+class PoolProcesos:
+    """
+    ProcessPoolExecutor perezoso (se crea en la primera tarea) que se
+    reconstruye si se rompe. Las tareas se lanzan por lotes con mapear/ejecutar:
+    si el pool se rompe a mitad, el lote entero se reintenta una vez en uno nuevo.
+    Con RECICLAR_POOL, tras TAREAS_POR_PROCESO * max_workers tareas los lotes
+    nuevos van a un pool nuevo; el anterior termina lo pendiente y se cierra.
+    """
+
+    def __init__(self, max_workers):
+        self.max_workers = max_workers
+        self._pool = None
+        self._tareas = 0
+        self._lock = threading.Lock()
+
+    def ejecutar(self, funcion, *args):
+        return self.mapear(funcion, [args])[0]
+
+    def mapear(self, funcion, argumentos):
+        """funcion(*args) para cada tupla de argumentos; resultados en orden."""
+        argumentos = list(argumentos)
+        try:
+            return self._lanzar(funcion, argumentos)
+        except BrokenProcessPool:
+            return self._lanzar(funcion, argumentos)
+
+    def _lanzar(self, funcion, argumentos):
+        pool = self._actual(len(argumentos))
+        try:
+            futuros = [pool.submit(funcion, *args) for args in argumentos]
+            return [f.result() for f in futuros]
+        except BrokenProcessPool:
+            self._descartar(pool)
+            raise
+
+    def _actual(self, tareas):
+        viejo = None
+        with self._lock:
+            if (RECICLAR_POOL and self._pool is not None
+                    and self._tareas >= TAREAS_POR_PROCESO * self.max_workers):
+                viejo, self._pool = self._pool, None
+            if self._pool is None:
+                self._pool = nuevo_pool(self.max_workers)
+                self._tareas = 0
+            self._tareas += tareas
+            pool = self._pool
+
+        if viejo is not None:
+            viejo.shutdown(wait=False)
+        return pool
+
+    def _descartar(self, pool):
+        # Otro hilo puede haberlo reemplazado ya: solo se quita si sigue siendo este
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False)
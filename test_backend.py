@@ -73,6 +73,97 @@ def test_app_start():
         traceback.print_exc()
         return False
 
+# Fixtures DOCX mínimos para _leer_docx: se escriben con zipfile (no hace
+# falta python-docx). Lo esperado es lo que devuelve Document.paragraphs
+_DOCX_RELS = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="{destino}"/>'
+    '</Relationships>'
+)
+_DOCX_TIPOS = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/{destino}" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '</Types>'
+)
+_DOCX_DOCUMENTO = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+    ' xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"'
+    ' xmlns:wps="http://schemas.microsoft.com/office/word/2010/wordprocessingShape">'
+    '<w:body>{cuerpo}<w:sectPr/></w:body></w:document>'
+)
+
+_CASOS_DOCX = [
+    ("párrafos del cuerpo",
+     '<w:p><w:r><w:t>Hola </w:t></w:r><w:r><w:t>mundo</w:t></w:r></w:p>'
+     '<w:p/>'
+     '<w:p><w:r><w:t>Fin ñ</w:t></w:r></w:p>',
+     "Hola mundo\n\nFin ñ"),
+    ("tabulador y saltos",
+     '<w:p><w:r><w:t>Uno</w:t><w:tab/><w:t>dos</w:t><w:br/><w:t>tres</w:t><w:cr/></w:r></w:p>',
+     "Uno\tdos\ntres\n"),
+    ("tablas fuera",
+     '<w:p><w:r><w:t>antes</w:t></w:r></w:p>'
+     '<w:tbl><w:tr><w:tc><w:p><w:r><w:t>celda</w:t></w:r></w:p></w:tc></w:tr></w:tbl>'
+     '<w:p><w:r><w:t>después</w:t></w:r></w:p>',
+     "antes\ndespués"),
+    ("cuadro de texto fuera",
+     '<w:p><w:r><w:t>ancla</w:t><w:drawing><wps:txbx><w:txbxContent>'
+     '<w:p><w:r><w:t>caja</w:t></w:r></w:p>'
+     '</w:txbxContent></wps:txbx></w:drawing></w:r></w:p>',
+     "ancla"),
+    ("hipervínculos, revisiones y campos fuera",
+     '<w:p><w:r><w:t>ver </w:t></w:r>'
+     '<w:hyperlink r:id="rId9"><w:r><w:t>enlace</w:t></w:r></w:hyperlink>'
+     '<w:ins><w:r><w:t>insertado</w:t></w:r></w:ins>'
+     '<w:smartTag><w:r><w:t>etiqueta</w:t></w:r></w:smartTag>'
+     '<w:fldSimple><w:r><w:t>campo</w:t></w:r></w:fldSimple>'
+     '<w:r><w:t>fin</w:t></w:r></w:p>',
+     "ver fin"),
+]
+
+
+def _escribir_docx(ruta, cuerpo, destino="word/document.xml"):
+    import zipfile
+    with zipfile.ZipFile(ruta, "w") as z:
+        z.writestr("[Content_Types].xml", _DOCX_TIPOS.format(destino=destino))
+        z.writestr("_rels/.rels", _DOCX_RELS.format(destino=destino))
+        z.writestr(destino, _DOCX_DOCUMENTO.format(cuerpo=cuerpo))
+
+
+def test_lector_docx():
+    """Prueba _leer_docx con DOCX mínimos (mismo texto que Document.paragraphs)"""
+    print("\nProbando lector DOCX...")
+    import tempfile
+    from document_processor import _leer_docx
+
+    casos = _CASOS_DOCX + [
+        ("parte principal fuera de word/document.xml",
+         '<w:p><w:r><w:t>otra ruta</w:t></w:r></w:p>', "otra ruta", "word/document2.xml"),
+    ]
+
+    todo_ok = True
+    with tempfile.TemporaryDirectory() as carpeta:
+        for i, (nombre, cuerpo, esperado, *destino) in enumerate(casos):
+            ruta = os.path.join(carpeta, f"caso{i}.docx")
+            _escribir_docx(ruta, cuerpo, *destino)
+            try:
+                texto = _leer_docx(ruta)
+            except Exception as e:
+                texto = f"<{e}>"
+            if texto == esperado:
+                print(f"✓ {nombre}")
+            else:
+                print(f"✗ {nombre}: {texto!r} (esperado {esperado!r})")
+                todo_ok = False
+
+    return todo_ok
+
+
 if __name__ == '__main__':
     print("=" * 60)
     print("PRUEBA DEL BACKEND - ExamenNaval")
@@ -83,6 +174,7 @@ if __name__ == '__main__':
     all_ok = test_imports() and all_ok
     all_ok = test_initialization() and all_ok
     all_ok = test_app_start() and all_ok
+    all_ok = test_lector_docx() and all_ok
     
     print("\n" + "=" * 60)
     if all_ok:
@@ -0,0 +1,42 @@
+"""
+texto_util.py
+-----------------------------------------------------
+Decodificación de archivos de texto (TXT/CSV) subidos con codificación
+desconocida. Sin dependencias del resto del backend: lo usan tanto
+document_processor como pdf_converter.
+-----------------------------------------------------
+"""
+
+import chardet
+
+# Bytes que chardet analiza para adivinar la codificación de un TXT/CSV
+MUESTRA_CODIFICACION = 64 * 1024
+
+
+def decodificar_texto(datos):
+    """
+    Decodifica un TXT/CSV en una sola pasada. UTF-8 es lo habitual: si la
+    mayoría de los caracteres no ASCII son UTF-8 válido, los bytes sueltos
+    inválidos se sustituyen por "\ufffd". Si no, chardet mira
+    MUESTRA_CODIFICACION bytes desde la línea del primer byte inválido (un
+    prefijo ASCII no dice nada de la codificación).
+    """
+    try:
+        return datos.decode("utf-8")
+    except UnicodeDecodeError as e:
+        # Desde el comienzo de la línea del primer byte inválido
+        inicio = datos.rfind(b"\n", max(0, e.start - 1024), e.start) + 1 or max(0, e.start - 1024)
+
+    texto = datos.decode("utf-8", errors="replace")
+    invalidos = texto.count("\ufffd")
+    no_ascii = len(texto) - len(texto.encode("ascii", errors="ignore"))
+    if no_ascii - invalidos >= invalidos:
+        return texto
+
+    encoding = chardet.detect(datos[inicio:inicio + MUESTRA_CODIFICACION])["encoding"]
+    if not encoding or encoding.lower() == "ascii":
+        return texto
+    try:
+        return datos.decode(encoding, errors="replace")
+    except LookupError:
+        return texto
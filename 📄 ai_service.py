@@ -14,75 +14,177 @@ Replica EXACTAMENTE la lógica de generación de tests de la app Android:
 """
 
 import os
-import json
 import re
+import math
 import time
+import atexit
 import random
+import hashlib
+import threading
+import collections
+import functools
+import diskcache
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
 
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 DEFAULT_MODEL = "gemini-2.0-flash-lite"
 
+# Máximo de llamadas simultáneas a Gemini por proceso (compartido entre peticiones)
+GEMINI_CONCURRENCY = int(os.getenv("GEMINI_CONCURRENCY", "5"))
+
+# Hilos del pool de Gemini. Las esperas entre reintentos (hasta un minuto)
+# ocupan un hilo pero no una llamada: cada petición tiene como mucho
+# GEMINI_CONCURRENCY bloques en curso, así que una que esté esperando no
+# deja sin hilos a las demás
+GEMINI_THREADS = int(os.getenv("GEMINI_THREADS", str(GEMINI_CONCURRENCY * 4)))
+
+# Códigos que merecen reintento con espera exponencial (cuota / servidor)
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# Cortocircuito: tras CIRCUITO_FALLOS_MAX llamadas seguidas sin respuesta por
+# cuota o caída del servicio, no se llama a Gemini durante CIRCUITO_PAUSA s
+CIRCUITO_FALLOS_MAX = 5
+CIRCUITO_PAUSA = 60
+
+# Espera máxima que se acepta de una cabecera Retry-After
+MAX_RETRY_AFTER = 60
+
+# El cuerpo se serializa con orjson; hay que declarar el tipo a mano
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Sesión HTTP compartida: reutiliza las conexiones TLS hacia Gemini
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(pool_connections=16, pool_maxsize=32))
+atexit.register(_session.close)
+
+# Cola única de llamadas: los bloques de todas las peticiones en curso se
+# reparten entre los mismos hilos y conexiones
+_gemini_pool = ThreadPoolExecutor(max_workers=GEMINI_THREADS, thread_name_prefix="gemini")
+
+# Plazas para llamadas HTTP en curso; se sueltan antes de esperar un reintento
+_gemini_llamadas = threading.BoundedSemaphore(GEMINI_CONCURRENCY)
+
+# Caché en disco de preguntas por bloque (clave = modelo + objetivo + hash del texto)
+GEMINI_CACHE_DIR = os.getenv("GEMINI_CACHE_DIR", "/tmp/gemini_cache")
+_cache = diskcache.Cache(GEMINI_CACHE_DIR)
+
+_circuito = {"fallos": 0, "abierto_hasta": 0.0}
+_circuito_lock = threading.Lock()
+
 
 # ======================================================
 # 🔥 1. LLAMAR A GEMINI CON REINTENTOS
 # ======================================================
+@functools.lru_cache(maxsize=16)
+def gemini_endpoint(model_name: str):
+    return (
+        f"https://generativelanguage.googleapis.com/v1beta/models/"
+        f"{model_name}:generateContent?key={GEMINI_API_KEY}"
+    )
+
+
+def circuito_abierto():
+    with _circuito_lock:
+        return time.monotonic() < _circuito["abierto_hasta"]
+
+
+def registrar_llamada(caida):
+    """
+    caida=True: la llamada agotó los reintentos por cuota/servidor/red.
+    El contador no se reinicia al abrir: pasada la pausa, un solo fallo más
+    vuelve a abrir el circuito; un acierto lo cierra.
+    """
+    with _circuito_lock:
+        if not caida:
+            _circuito["fallos"] = 0
+            return
+        _circuito["fallos"] += 1
+        if _circuito["fallos"] >= CIRCUITO_FALLOS_MAX:
+            _circuito["abierto_hasta"] = time.monotonic() + CIRCUITO_PAUSA
+
+
+def espera_reintento(r, intento):
+    # Retry-After (segundos) manda; si no, backoff exponencial 10s, 20s, 40s...
+    # con algo de jitter para que los hilos no reintenten a la vez.
+    # Un Retry-After negativo cuenta como 0 y uno nan/inf se ignora (time.sleep
+    # lanzaría ValueError fuera del try de call_gemini)
+    try:
+        espera = float(r.headers["Retry-After"])
+        if math.isfinite(espera):
+            return min(max(0.0, espera), MAX_RETRY_AFTER)
+    except (KeyError, ValueError):
+        pass
+    return 10 * 2 ** intento + random.uniform(0, 1)
+
+
 def call_gemini(prompt: str, model_name: str = DEFAULT_MODEL, retries: int = 2):
     if not GEMINI_API_KEY:
         raise Exception("GEMINI_API_KEY no configurada")
 
-    endpoint = (
-        f"https://generativelanguage.googleapis.com/v1beta/models/"
-        f"{model_name}:generateContent?key={GEMINI_API_KEY}"
-    )
+    if circuito_abierto():
+        print("[Gemini] Circuito abierto: se omite la llamada")
+        return None
+
+    endpoint = gemini_endpoint(model_name)
 
-    payload = {
+    body = orjson.dumps({
         "contents": [
             {"parts": [{"text": prompt}]}
         ]
-    }
+    })
 
+    caida = False
     for intento in range(retries):
+        espera = 1.1
+        caida = False
         try:
-            r = requests.post(endpoint, json=payload, timeout=60)
-            data = r.json()
+            with _gemini_llamadas:
+                r = _session.post(endpoint, data=body, headers=_JSON_HEADERS, timeout=60)
 
             if r.status_code == 200:
                 try:
+                    data = orjson.loads(r.content)
                     text = data["candidates"][0]["content"]["parts"][0]["text"]
                     if text:
+                        registrar_llamada(caida=False)
                         return text
                 except:
                     pass
+            elif r.status_code in RETRY_STATUS:
+                caida = True
+                espera = espera_reintento(r, intento)
 
         except Exception as e:
+            caida = True
             print(f"[Gemini Error] Intento {intento+1}: {e}")
 
-        time.sleep(1.1)
+        if intento < retries - 1:
+            time.sleep(espera)
 
+    registrar_llamada(caida)
     return None
 
 
 # ======================================================
 # 🔥 2. LIMPIAR RESPUESTA Y EXTRAER SOLO EL JSON
 # ======================================================
+_JSON_ARRAY_RE = re.compile(r"\[.*\]", re.S)
+
+
 def extract_clean_json(text):
     if not text:
         return "[]"
 
-    # Remove markdown
-    text = text.replace("```json", "").replace("```", "")
-    text = text.strip()
-
-    # Search for JSON array
-    start = text.find("[")
-    end = text.rfind("]")
-
-    if start == -1 or end == -1:
+    # Search for JSON array (from first "[" to last "]"; markdown fences fall outside)
+    match = _JSON_ARRAY_RE.search(text)
+    if not match:
         return "[]"
 
-    return text[start:end+1]
+    return match.group(0)
 
 
 # ======================================================
@@ -156,18 +258,13 @@ def shuffle_alternatives(question):
 # ======================================================
 # 🔥 6. CONSTRUIR PROMPT COMPLETO
 # ======================================================
-def build_prompt(bloque, num, total, preguntas):
-    return f"""
-Eres un generador de preguntas tipo test. 
+_PROMPT_HEADER = """Eres un generador de preguntas tipo test. 
 Tu tarea es crear preguntas basadas únicamente en el siguiente bloque de texto.
 
 CONTEXTO:
-- Este es el bloque {num} de {total}.
-- Evita repetir información generada anteriormente.
+- Este es el bloque """
 
-INSTRUCCIONES CRÍTICAS:
-1. Genera al menos {preguntas} preguntas.
-2. EXACTAMENTE 4 alternativas: a, b, c, d.
+_PROMPT_FOOTER = """2. EXACTAMENTE 4 alternativas: a, b, c, d.
 3. Solo UNA alternativa correcta.
 4. No inventes datos.
 5. NO agregues texto fuera del JSON.
@@ -175,22 +272,43 @@ INSTRUCCIONES CRÍTICAS:
 
 FORMATO:
 [
-  {{
+  {
     "texto": "",
     "alternativas": ["a) ...", "b) ...", "c) ...", "d) ..."],
     "correcta": "b"
-  }}
+  }
 ]
 
 BLOQUE:
-{bloque}
-""".strip()
+"""
+
+
+def build_prompt(bloque, num, total, preguntas):
+    contexto = (
+        f"{num} de {total}.\n"
+        "- Evita repetir información generada anteriormente.\n\n"
+        "INSTRUCCIONES CRÍTICAS:\n"
+        f"1. Genera al menos {preguntas} preguntas.\n"
+    )
+    return "".join((_PROMPT_HEADER, contexto, _PROMPT_FOOTER, bloque)).strip()
 
 
 # ======================================================
 # 🔥 7. GENERAR PREGUNTAS POR BLOQUE
 # ======================================================
-def generar_preguntas_por_bloque(block_text, block_num, total_blocks, questions_goal, model=DEFAULT_MODEL):
+def cache_key(block_text, questions_goal, model):
+    digest = hashlib.blake2b(block_text.encode("utf-8"), digest_size=16).hexdigest()
+    return f"{model}:{questions_goal}:{digest}"
+
+
+def generar_preguntas_por_bloque(block_text, block_num, total_blocks, questions_goal,
+                                 model=DEFAULT_MODEL, force_refresh=False):
+
+    key = cache_key(block_text, questions_goal, model)
+    if not force_refresh:
+        cached = _cache.get(key)
+        if cached:
+            return [shuffle_alternatives(q) for q in cached]
 
     prompt = build_prompt(block_text, block_num, total_blocks, questions_goal)
     raw = call_gemini(prompt, model_name=model)
@@ -202,7 +320,7 @@ def generar_preguntas_por_bloque(block_text, block_num, total_blocks, questions_
     fixed = fix_json(clean)
 
     try:
-        arr = json.loads(fixed)
+        arr = orjson.loads(fixed)
     except:
         return []
 
@@ -210,27 +328,57 @@ def generar_preguntas_por_bloque(block_text, block_num, total_blocks, questions_
     for q in arr:
         qn = normalize_question(q)
         if qn:
-            qn = shuffle_alternatives(qn)
             final.append(qn)
 
-    return final
+    # Se guarda antes de reordenar: cada acierto de caché baraja de nuevo
+    if final:
+        _cache.set(key, final)
+
+    return [shuffle_alternatives(q) for q in final]
 
 
 # ======================================================
 # 🔥 8. GENERAR EXAMEN COMPLETO (para app.py)
 # ======================================================
-def generar_examen(texto, bloques, preguntas_por_bloque, modelo=DEFAULT_MODEL):
-    todo = []
+def generar_examen(texto, bloques, preguntas_por_bloque, modelo=DEFAULT_MODEL, force_refresh=False):
+    """
+    Los bloques se encolan en el pool compartido de Gemini (máximo
+    GEMINI_CONCURRENCY llamadas a la vez por proceso, y como mucho
+    GEMINI_CONCURRENCY bloques de esta petición en curso); el resultado
+    conserva el orden original de los bloques.
+    Con force_refresh=True se ignora la caché y se regeneran las preguntas.
+    Los bloques idénticos (cabeceras, avisos repetidos) se envían una sola vez.
+    """
+    unicos = {}
+    for bloque in bloques:
+        digest = hashlib.blake2b(bloque.encode("utf-8"), digest_size=16).digest()
+        unicos.setdefault(digest, bloque)
+    bloques = list(unicos.values())
 
-    for i, bloque in enumerate(bloques, start=1):
-        preguntas = generar_preguntas_por_bloque(
+    if not bloques:
+        return []
+
+    def procesar(args):
+        i, bloque = args
+        return generar_preguntas_por_bloque(
             block_text=bloque,
             block_num=i,
             total_blocks=len(bloques),
             questions_goal=preguntas_por_bloque,
-            model=modelo
+            model=modelo,
+            force_refresh=force_refresh
         )
 
-        todo.extend(preguntas)
+    # Ventana de GEMINI_CONCURRENCY bloques: se encola el siguiente al
+    # recoger el más antiguo
+    todo = []
+    en_curso = collections.deque()
+    for args in enumerate(bloques, start=1):
+        if len(en_curso) >= GEMINI_CONCURRENCY:
+            todo.extend(en_curso.popleft().result())
+        en_curso.append(_gemini_pool.submit(procesar, args))
+
+    while en_curso:
+        todo.extend(en_curso.popleft().result())
 
     return todo